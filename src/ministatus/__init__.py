@@ -1,10 +1,9 @@
-def _get_version() -> str:
-    from importlib.metadata import version
-
-    return version(_dist_name)
+from functools import cache
+from typing import TYPE_CHECKING
 
 
-def _get_user_agent() -> str:
+@cache
+def get_user_agent() -> str:
     from importlib.metadata import metadata
     from typing import cast
 
@@ -19,6 +18,21 @@ def _get_user_agent() -> str:
     return f"{name}/{version} ({homepage})"
 
 
+@cache
+def _get_version() -> str:
+    from importlib.metadata import version
+
+    return version(_dist_name)
+
+
 _dist_name = "ministatus"
-__version__ = _get_version()
-_user_agent = _get_user_agent()
+
+if TYPE_CHECKING:
+    __version__: str
+else:
+
+    def __getattr__(name: str):
+        # Only read the package metadata when the version is actually needed
+        if name == "__version__":
+            return _get_version()
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,32 @@
 import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
 import platformdirs
 
 _appname = "ministatus"
 if _appsuffix := os.getenv("MIST_APPDIR_SUFFIX"):
     _appname = f"{_appname}-{_appsuffix}"
 
-APP_DIRS = platformdirs.PlatformDirs(
-    appauthor="thegamecracks",
-    appname=_appname,
-    ensure_exists=True,
-    opinion=True,
-)
-DB_PATH = APP_DIRS.user_data_path / f"{APP_DIRS.appname}.db"
+if TYPE_CHECKING:
+    APP_DIRS: platformdirs.PlatformDirs
+    DB_PATH: Path
+
+
+def __getattr__(name: str) -> Any:
+    # Created on first access since ensure_exists=True touches the filesystem
+    if name == "APP_DIRS":
+        value = platformdirs.PlatformDirs(
+            appauthor="thegamecracks",
+            appname=_appname,
+            ensure_exists=True,
+            opinion=True,
+        )
+    elif name == "DB_PATH":
+        app_dirs = __getattr__("APP_DIRS")
+        value = app_dirs.user_data_path / f"{app_dirs.appname}.db"
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
@@ -1,17 +1,41 @@
+import asyncio
+import functools
 import importlib.metadata
 import logging
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
 
 import aiohttp
 import click
 import discord
 from discord.ext import commands
 
-from ministatus import _user_agent
+from ministatus import get_user_agent
 from ministatus.bot.cogs import list_extensions
-from ministatus.db import connect_client
+from ministatus.db import (
+    ConnectionPool,
+    SQLiteConnection,
+    TransactionMode,
+    connect_client,
+)
+
+if TYPE_CHECKING:
+    from ministatus.bot.cogs.status.alert import DisableRequest
 
 log = logging.getLogger(__name__)
 
+_INTENTS = discord.Intents(
+    guilds=True,
+    messages=True,
+)
+_INVITE_PERMS = discord.Permissions(
+    read_messages=True,
+    send_messages=True,
+    send_messages_in_threads=True,
+    embed_links=True,
+    attach_files=True,
+)
+
 
 class Bot(commands.Bot):
     _sync_on_setup = False
@@ -20,13 +44,15 @@ class Bot(commands.Bot):
         super().__init__(
             command_prefix=commands.when_mentioned,
             help_command=None,
-            intents=discord.Intents(
-                guilds=True,
-                messages=True,
-            ),
+            intents=_INTENTS,
             max_messages=None,
             strip_after_prefix=True,
         )
+        self._db_pool = ConnectionPool()
+        self._invite_cache: dict[int, str] = {}
+        # Filled by the status cog's disable_* functions and flushed after
+        # every query run, or when the cog is unloaded
+        self.status_disable_queue: asyncio.Queue[DisableRequest] = asyncio.Queue()
 
     async def login(self, token: str) -> None:
         try:
@@ -43,14 +69,31 @@ class Bot(commands.Bot):
         async with self._create_http_client() as self.session:
             return await super().start(*args, **kwargs)
 
+    async def close(self) -> None:
+        await super().close()
+        await self._db_pool.close()
+
+    @asynccontextmanager
+    async def acquire_db_conn(
+        self,
+        *,
+        transaction: TransactionMode = True,
+    ) -> AsyncIterator[SQLiteConnection]:
+        # Frequent, short-lived queries like event listeners can share
+        # pooled connections instead of opening a new one each time.
+        async with self._db_pool.acquire(transaction=transaction) as conn:
+            yield conn
+
     async def setup_hook(self) -> None:
         assert self.application is not None
         async with connect_client() as client:
             await client.set_setting("appid", self.application.id)
 
-        for extension in list_extensions():
-            log.info(f"Loading extension {extension}")
-            await self.load_extension(extension)
+        # Extensions don't depend on each other, so their setup can overlap
+        async with asyncio.TaskGroup() as tg:
+            for extension in list_extensions():
+                log.info(f"Loading extension {extension}")
+                tg.create_task(self.load_extension(extension))
         await self._maybe_load_jishaku()
 
         if self._sync_on_setup:
@@ -61,33 +104,40 @@ class Bot(commands.Bot):
         log.info("Invite link:\n    %s", invite_link)
 
     def _create_http_client(self) -> aiohttp.ClientSession:
-        return aiohttp.ClientSession(headers={"User-Agent": _user_agent})
+        return aiohttp.ClientSession(headers={"User-Agent": get_user_agent()})
 
     async def _maybe_load_jishaku(self) -> None:
-        try:
-            version = importlib.metadata.version("jishaku")
-        except importlib.metadata.PackageNotFoundError:
-            pass
-        else:
-            await self.load_extension("jishaku")
-            log.info("Loaded jishaku extension (v%s)", version)
+        version = _get_jishaku_version()
+        if version is None:
+            return
+
+        await self.load_extension("jishaku")
+        log.info("Loaded jishaku extension (v%s)", version)
 
     def get_standard_invite(self, application_id: int | None = None) -> str:
         if application_id is None:
             assert self.application is not None
             application_id = self.application.id
 
-        return discord.utils.oauth_url(
+        invite = self._invite_cache.get(application_id)
+        if invite is not None:
+            return invite
+
+        invite = discord.utils.oauth_url(
             application_id,
             scopes=("bot",),
-            permissions=discord.Permissions(
-                read_messages=True,
-                send_messages=True,
-                send_messages_in_threads=True,
-                embed_links=True,
-                attach_files=True,
-            ),
+            permissions=_INVITE_PERMS,
         )
+        self._invite_cache[application_id] = invite
+        return invite
 
 
 class Context(commands.Context[Bot]): ...
+
+
+@functools.cache
+def _get_jishaku_version() -> str | None:
+    try:
+        return importlib.metadata.version("jishaku")
+    except importlib.metadata.PackageNotFoundError:
+        return None
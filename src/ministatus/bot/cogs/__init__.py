@@ -1,5 +1,7 @@
+import functools
 import pkgutil
 
 
-def list_extensions() -> list[str]:
-    return [info.name for info in pkgutil.iter_modules(__path__, f"{__name__}.")]
+@functools.cache
+def list_extensions() -> tuple[str, ...]:
+    return tuple(info.name for info in pkgutil.iter_modules(__path__, f"{__name__}."))
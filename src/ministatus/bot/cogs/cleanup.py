@@ -1,4 +1,5 @@
 import datetime
+import json
 import logging
 
 import discord
@@ -6,7 +7,6 @@ from discord.ext import commands, tasks
 
 from ministatus.bot.bot import Bot
 from ministatus.bot.dt import utcnow
-from ministatus.db import connect
 
 log = logging.getLogger(__name__)
 
@@ -26,7 +26,7 @@ class Cleanup(commands.Cog):
 
     @commands.Cog.listener("on_guild_channel_delete")
     async def remove_guild_channel(self, channel: discord.abc.GuildChannel) -> None:
-        async with connect() as conn:
+        async with self.bot.acquire_db_conn() as conn:
             await conn.execute(
                 "DELETE FROM discord_channel WHERE channel_id = $1",
                 channel.id,
@@ -34,7 +34,7 @@ class Cleanup(commands.Cog):
 
     @commands.Cog.listener("on_raw_thread_delete")
     async def remove_thread(self, payload: discord.RawThreadDeleteEvent) -> None:
-        async with connect() as conn:
+        async with self.bot.acquire_db_conn() as conn:
             await conn.execute(
                 "DELETE FROM discord_channel WHERE channel_id = $1",
                 payload.thread_id,
@@ -42,7 +42,7 @@ class Cleanup(commands.Cog):
 
     @commands.Cog.listener("on_raw_message_delete")
     async def remove_message(self, payload: discord.RawMessageDeleteEvent):
-        async with connect() as conn:
+        async with self.bot.acquire_db_conn() as conn:
             await conn.execute(
                 "DELETE FROM discord_message WHERE message_id = $1",
                 payload.message_id,
@@ -50,17 +50,17 @@ class Cleanup(commands.Cog):
 
     @commands.Cog.listener("on_raw_bulk_message_delete")
     async def bulk_remove_messages(self, payload: discord.RawBulkMessageDeleteEvent):
-        mid = ", ".join("?" * len(payload.message_ids))
-        async with connect() as conn:
+        async with self.bot.acquire_db_conn() as conn:
             await conn.execute(
-                f"DELETE FROM discord_message WHERE id IN ({mid})",
-                *payload.message_ids,
+                "DELETE FROM discord_message "
+                "WHERE message_id IN (SELECT value FROM json_each($1))",
+                json.dumps(list(payload.message_ids)),
             )
 
     # NOTE: members intent required
     @commands.Cog.listener("on_raw_member_remove")
     async def remove_member(self, payload: discord.RawMemberRemoveEvent) -> None:
-        async with connect() as conn:
+        async with self.bot.acquire_db_conn() as conn:
             await conn.execute(
                 "DELETE FROM discord_member WHERE guild_id = $1 AND user_id = $2",
                 payload.guild_id,
@@ -81,14 +81,15 @@ class Cleanup(commands.Cog):
         if not guild_ids:
             return  # cache might be empty, don't do antyhing
 
-        async with connect(transaction=False) as conn:
+        async with self.bot.acquire_db_conn(transaction="write") as conn:
             rows = await conn.fetch("SELECT guild_id FROM discord_guild")
             rows = {row[0] for row in rows}
             deleted = rows - guild_ids
             if deleted:
-                await conn.executemany(
-                    "DELETE FROM discord_guild WHERE guild_id = $1",
-                    [(guild_id,) for guild_id in deleted],
+                await conn.execute(
+                    "DELETE FROM discord_guild "
+                    "WHERE guild_id IN (SELECT value FROM json_each($1))",
+                    json.dumps(list(deleted)),
                 )
 
         if deleted:
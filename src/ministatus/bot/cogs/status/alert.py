@@ -1,16 +1,24 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
+from dataclasses import dataclass
 from io import BytesIO
-from typing import TYPE_CHECKING, Any, Collection
+from typing import TYPE_CHECKING, Any, Collection, Literal
 
 import discord
 
-from ministatus.bot.db import connect_discord_database_client
+from ministatus.bot.db import DiscordDatabaseClient, connect_discord_database_client
 from ministatus.bot.dt import utcnow
 from ministatus.bot.views import LayoutView
-from ministatus.db import Status, StatusAlert, StatusDisplay, StatusQuery, connect
+from ministatus.db import (
+    DatabaseClient,
+    Status,
+    StatusAlert,
+    StatusDisplay,
+    StatusQuery,
+)
 
 if TYPE_CHECKING:
     from ministatus.bot.bot import Bot
@@ -19,122 +27,184 @@ ERROR_COLOUR = 0xFF4040
 WARNING_COLOUR = 0xFF9640
 SUCCESS_COLOUR = 0x5CFF69
 
+# Limits how many alert messages are sent in parallel across all statuses
+ALERT_MAX_CONCURRENCY = 25
+# Discord's global rate limit for bots, in requests per second
+ALERT_RATE_LIMIT = 50
+
 log = logging.getLogger(__name__)
 
+_send_sem = asyncio.Semaphore(ALERT_MAX_CONCURRENCY)
+
+# Failure reasons are usually one of a few fixed messages
+_escape_markdown = functools.lru_cache(maxsize=512)(discord.utils.escape_markdown)
+
+_SQL_DISABLE_ALERT = (
+    "UPDATE status_alert SET enabled_at = NULL, failed_at = $1 "
+    "WHERE status_alert_id = $2"
+)
+_SQL_DISABLE_DISPLAY = (
+    "UPDATE status_display SET enabled_at = NULL, failed_at = $1 WHERE message_id = $2"
+)
+_SQL_DISABLE_QUERY = (
+    "UPDATE status_query SET enabled_at = NULL, failed_at = $1 "
+    "WHERE status_query_id = $2"
+)
+
 
-async def disable_alert(
+def disable_alert(
     bot: Bot,
     status: Status,
     alert: StatusAlert,
     reason: str,
 ) -> None:
     log.warning("Alert #%d is invalid: %s", alert.status_alert_id, reason)
-    async with connect() as conn:
-        await conn.execute(
-            "UPDATE status_alert SET enabled_at = NULL, failed_at = $1 "
-            "WHERE status_alert_id = $2",
-            utcnow(),
-            alert.status_alert_id,
-        )
-
-    await send_alert_disabled_alert(bot, status, alert, reason)
+    bot.status_disable_queue.put_nowait(
+        DisableRequest(status=status, target=alert, reason=reason)
+    )
 
 
-async def disable_display(
+def disable_display(
     bot: Bot,
     status: Status,
     display: StatusDisplay,
     reason: str,
 ) -> None:
     log.warning("Display #%d is invalid: %s", display.message_id, reason)
-    async with connect() as conn:
-        await conn.execute(
-            "UPDATE status_display SET enabled_at = NULL, failed_at = $1 "
-            "WHERE message_id = $2",
-            utcnow(),
-            display.message_id,
-        )
-
-    await send_alert_disabled_display(bot, status, display, reason)
+    bot.status_disable_queue.put_nowait(
+        DisableRequest(status=status, target=display, reason=reason)
+    )
 
 
-async def disable_query(
+def disable_query(
     bot: Bot,
     status: Status,
     query: StatusQuery,
     reason: str,
 ) -> None:
     log.warning("Query #%d is invalid: %s", query.status_query_id, reason)
-    async with connect() as conn:
-        await conn.execute(
-            "UPDATE status_query SET enabled_at = NULL, failed_at = $1 "
-            "WHERE status_query_id = $2",
-            utcnow(),
-            query.status_query_id,
-        )
-
-    await send_alert_disabled_query(bot, status, query, reason)
-
-
-async def send_alert_disabled_alert(
-    bot: Bot,
-    status: Status,
-    alert: StatusAlert,
-    reason: str,
-) -> None:
-    status_id = alert.status_id
-    async with connect_discord_database_client(bot) as ddc:
-        channel = await ddc.get_channel(channel_id=alert.channel_id)
-        alert_channels = await ddc.get_status_alert_channels(
-            status_id,
+    bot.status_disable_queue.put_nowait(
+        DisableRequest(status=status, target=query, reason=reason)
+    )
+
+
+async def flush_disable_requests(bot: Bot) -> None:
+    """Disable the alerts, displays, and queries queued by the disable_* functions.
+
+    Queued requests are written in a single transaction, after which their
+    audit alerts are sent. Errors are propagated to the caller, and if the
+    transaction fails, the failing items will be queued again on their
+    next query.
+
+    """
+    queue = bot.status_disable_queue
+    # Sending audit alerts can disable more alert channels, so keep going
+    # until nothing is left
+    while not queue.empty():
+        requests = [queue.get_nowait() for _ in range(queue.qsize())]
+        await _flush_disable_requests(bot, requests)
+
+
+@dataclass(kw_only=True)
+class DisableRequest:
+    status: Status
+    target: StatusAlert | StatusDisplay | StatusQuery
+    reason: str
+
+    @property
+    def key(self) -> tuple[type, int]:
+        if isinstance(self.target, StatusAlert):
+            return StatusAlert, self.target.status_alert_id
+        elif isinstance(self.target, StatusDisplay):
+            return StatusDisplay, self.target.message_id
+        else:
+            return StatusQuery, self.target.status_query_id
+
+
+async def _flush_disable_requests(bot: Bot, requests: list[DisableRequest]) -> None:
+    # The same item can fail several times before we get to it, like an alert
+    # channel being sent multiple alerts at once, so only report it once
+    requests = list({r.key: r for r in requests}.values())
+
+    now = utcnow()
+    alert_ids = []
+    display_ids = []
+    query_ids = []
+    for r in requests:
+        if isinstance(r.target, StatusAlert):
+            alert_ids.append((now, r.target.status_alert_id))
+        elif isinstance(r.target, StatusDisplay):
+            display_ids.append((now, r.target.message_id))
+        else:
+            query_ids.append((now, r.target.status_query_id))
+
+    # Pooled connections are long-lived, so sqlite3's statement cache
+    # lets repeated disables skip re-compiling the same UPDATEs
+    async with bot.acquire_db_conn(transaction="write") as conn:
+        ddc = DiscordDatabaseClient(bot, DatabaseClient(conn))
+        if alert_ids:
+            await conn.executemany(_SQL_DISABLE_ALERT, alert_ids)
+        if display_ids:
+            await conn.executemany(_SQL_DISABLE_DISPLAY, display_ids)
+        if query_ids:
+            await conn.executemany(_SQL_DISABLE_QUERY, query_ids)
+
+        # Look up audit channels for every affected status at once,
+        # rather than once per disabled item
+        status_ids = {
+            r.status.status_id
+            for r in requests
+            if _has_alert_channels(r.status, "audit")
+        }
+        bulk_channels = await ddc.get_bulk_status_alert_channels(
+            *status_ids,
             only_enabled=True,
             type="audit",
         )
 
-    view = AlertDisabledAlert(status, alert, channel, reason)
-    await send_alerts(bot, status, alert_channels, view)
-
-
-async def send_alert_disabled_display(
-    bot: Bot,
-    status: Status,
-    display: StatusDisplay,
-    reason: str,
-) -> None:
-    status_id = display.status_id
-    async with connect_discord_database_client(bot) as ddc:
-        message = await ddc.get_message(message_id=display.message_id)
-        alert_channels = await ddc.get_status_alert_channels(
-            status_id,
-            only_enabled=True,
-            type="audit",
+        requests = [r for r in requests if bulk_channels.get(r.status.status_id)]
+        subjects = await asyncio.gather(
+            *(_fetch_disabled_subject(ddc, r) for r in requests)
         )
 
-    message = message or display.message_id
-    view = AlertDisabledDisplay(status, display, message, reason)
-    await send_alerts(bot, status, alert_channels, view)
+    # Don't hold onto the write lock while waiting on Discord
+    results = await asyncio.gather(
+        *(
+            send_alerts(
+                bot,
+                r.status,
+                bulk_channels[r.status.status_id],
+                _create_disabled_view(r, subject),
+            )
+            for r, subject in zip(requests, subjects)
+        ),
+        return_exceptions=True,
+    )
+    _raise_alert_exceptions(results)
 
 
-async def send_alert_disabled_query(
-    bot: Bot,
-    status: Status,
-    query: StatusQuery,
-    reason: str,
-) -> None:
-    status_id = query.status_id
-    async with connect_discord_database_client(bot) as ddc:
-        alert_channels = await ddc.get_status_alert_channels(
-            status_id,
-            only_enabled=True,
-            type="audit",
-        )
+async def _fetch_disabled_subject(ddc: DiscordDatabaseClient, r: DisableRequest) -> Any:
+    if isinstance(r.target, StatusAlert):
+        return await ddc.get_channel(channel_id=r.target.channel_id)
+    elif isinstance(r.target, StatusDisplay):
+        message = await ddc.get_message(message_id=r.target.message_id)
+        return message or r.target.message_id
 
-    view = AlertDisabledQuery(status, query, reason)
-    await send_alerts(bot, status, alert_channels, view)
+
+def _create_disabled_view(r: DisableRequest, subject: Any) -> Alert:
+    if isinstance(r.target, StatusAlert):
+        return AlertDisabledAlert(r.status, r.target, subject, r.reason)
+    elif isinstance(r.target, StatusDisplay):
+        return AlertDisabledDisplay(r.status, r.target, subject, r.reason)
+    else:
+        return AlertDisabledQuery(r.status, r.target, r.reason)
 
 
 async def send_alert_downtime_started(bot: Bot, status: Status) -> None:
     status_id = status.status_id
+    if not _has_alert_channels(status, "downtime"):
+        return
+
     async with connect_discord_database_client(bot) as ddc:
         alert_channels = await ddc.get_status_alert_channels(
             status_id,
@@ -148,6 +218,9 @@ async def send_alert_downtime_started(bot: Bot, status: Status) -> None:
 
 async def send_alert_downtime_ended(bot: Bot, status: Status) -> None:
     status_id = status.status_id
+    if not _has_alert_channels(status, "downtime"):
+        return
+
     async with connect_discord_database_client(bot) as ddc:
         alert_channels = await ddc.get_status_alert_channels(
             status_id,
@@ -159,6 +232,17 @@ async def send_alert_downtime_ended(bot: Bot, status: Status) -> None:
     await send_alerts(bot, status, alert_channels, view)
 
 
+def _has_alert_channels(
+    status: Status,
+    type: Literal["audit", "downtime"],
+) -> bool:
+    # Most statuses have no alerts, so avoid querying for their channels.
+    # Statuses are loaded with their enabled alerts at the start of each run.
+    if type == "audit":
+        return any(a.enabled_at and a.send_audit for a in status.alerts)
+    return any(a.enabled_at and a.send_downtime for a in status.alerts)
+
+
 async def send_alerts(
     bot: Bot,
     status: Status,
@@ -169,27 +253,36 @@ async def send_alerts(
         return
 
     log.debug("Sending message to %d status alerts", len(alert_channels))
-    try:
-        async with asyncio.TaskGroup() as tg:
-            tasks = []
-            for alert, channel in alert_channels:
-                coro = try_send_alert(bot, status, alert, channel, view)
-                tasks.append(tg.create_task(coro))
-
-            # Let all tasks run first, and collect any errors to raise afterwards
-            await asyncio.wait(tasks)
-
-        exceptions = [e for t in tasks if (e := t.exception()) is not None]
-        if exceptions:
-            raise BaseExceptionGroup(
-                f"{len(exceptions)} query job(s) failed", exceptions
-            )
 
-    except* (discord.DiscordServerError, discord.RateLimited) as eg:
-        # Ergh, drop all other exceptions so tasks.loop() can handle it
-        e = eg.exceptions[0]
-        log.warning("One or more status alerts failed (%s)", type(e).__name__)
-        raise e from None
+    # Spread out large batches so they don't all hit the global rate limit
+    interval = 0.0
+    if len(alert_channels) > ALERT_RATE_LIMIT:
+        interval = 1 / ALERT_RATE_LIMIT
+
+    # Let every alert finish, so one failure doesn't cancel the others
+    results = await asyncio.gather(
+        *(
+            try_send_alert(bot, status, alert, channel, view, delay=i * interval)
+            for i, (alert, channel) in enumerate(alert_channels)
+        ),
+        return_exceptions=True,
+    )
+
+    _raise_alert_exceptions(results)
+
+
+def _raise_alert_exceptions(results: list[Any]) -> None:
+    exceptions = [e for e in results if isinstance(e, BaseException)]
+    for e in exceptions:
+        if isinstance(e, (discord.DiscordServerError, discord.RateLimited)):
+            # Ergh, drop all other exceptions so tasks.loop() can handle it
+            log.warning("One or more status alerts failed (%s)", type(e).__name__)
+            raise e
+
+    if exceptions:
+        raise BaseExceptionGroup(
+            f"{len(exceptions)} status alert(s) failed", exceptions
+        )
 
 
 async def try_send_alert(
@@ -198,18 +291,24 @@ async def try_send_alert(
     alert: StatusAlert,
     channel: discord.abc.MessageableChannel,
     view: Alert,
+    *,
+    delay: float = 0,
 ) -> None:
+    if delay > 0:
+        await asyncio.sleep(delay)
+
     kwargs = view.get_send_kwargs()
     try:
-        await channel.send(view=view, **kwargs)
+        async with _send_sem:
+            await channel.send(view=view, **kwargs)
     except discord.Forbidden:
         reason = "Missing permissions to send to channel"
         log.warning("Status alert #%d is invalid: %s", reason)
-        await disable_alert(bot, status, alert, reason)
+        disable_alert(bot, status, alert, reason)
     except discord.NotFound:
         reason = "Channel could not be found"
         log.warning("Status alert #%d is invalid: %s", reason)
-        await disable_alert(bot, status, alert, reason)
+        disable_alert(bot, status, alert, reason)
 
 
 class Alert(LayoutView):
@@ -240,7 +339,7 @@ class AlertDisabledAlert(AlertDisabled):
         reason: str,
     ) -> None:
         title = f"Alert for {status.label} failed"
-        reason = discord.utils.escape_markdown(reason)
+        reason = _escape_markdown(reason)
         content = (
             f"The alert channel {channel.jump_url} "
             f"has been disabled due to the following reason:\n"
@@ -259,7 +358,7 @@ class AlertDisabledDisplay(AlertDisabled):
     ) -> None:
         jump_url = str(message) if isinstance(message, int) else message.jump_url
         title = f"Display for {status.label} failed"
-        reason = discord.utils.escape_markdown(reason)
+        reason = _escape_markdown(reason)
         content = (
             f"The display message {jump_url} "
             f"has been disabled due to the following reason:\n"
@@ -271,7 +370,7 @@ class AlertDisabledDisplay(AlertDisabled):
 class AlertDisabledQuery(AlertDisabled):
     def __init__(self, status: Status, query: StatusQuery, reason: str) -> None:
         title = f"Query for {status.label} failed"
-        reason = discord.utils.escape_markdown(reason)
+        reason = _escape_markdown(reason)
         content = (
             f"The {query.type.label} query on {query.address} "
             f"has been disabled due to the following reason:\n"
@@ -308,6 +407,8 @@ class AlertDowntime(Alert):
             self.section.add_item(self.content)
 
     def get_send_kwargs(self) -> dict[str, Any]:
+        # discord.File can only be read once, so every send needs a new one.
+        # BytesIO shares the underlying bytes until written to, avoiding a copy.
         kwargs = {}
         if self.status.thumbnail:
             thumbnail = discord.File(BytesIO(self.status.thumbnail), "thumbnail.png")
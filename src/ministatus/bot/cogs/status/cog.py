@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import sqlite3
 import time
 
 import discord
@@ -11,7 +12,8 @@ from ministatus.bot.db import connect_discord_database_client
 from ministatus.bot.errors import ErrorResponse
 from ministatus.db import connect_client
 
-from .query import run_query_jobs
+from .alert import flush_disable_requests
+from .query import prune_history, run_query_jobs
 from .views import StatusManageView, StatusSummaryView, display_cache
 
 DEFAULT_QUERY_INTERVAL = 60
@@ -37,16 +39,24 @@ class StatusCog(
             discord.DiscordServerError,
             discord.RateLimited,
         )
+        # Pruning can overlap with other writes, like the CLI or a view,
+        # so don't let a locked database stop it for good
+        self.prune_loop.add_exception_type(sqlite3.OperationalError)
 
     async def cog_load(self) -> None:
         await self._set_query_interval()
         self.query_loop.start()
+        self.prune_loop.start()
 
     async def cog_unload(self) -> None:
         self.query_loop.cancel()
+        self.prune_loop.cancel()
         for view in display_cache.values():
             view.stop()
 
+        # Don't lose failures that were queued after the last query run
+        await flush_disable_requests(self.bot)
+
     @app_commands.command(name="manage")
     async def status_manage(self, interaction: discord.Interaction[Bot]) -> None:
         """Manage your server statuses."""
@@ -90,7 +100,12 @@ class StatusCog(
     @tasks.loop(seconds=60)
     async def query_loop(self) -> None:
         max_concurrency = await self._get_max_concurrency()
-        await run_query_jobs(self.bot, max_concurrency=max_concurrency)
+        try:
+            await run_query_jobs(self.bot, max_concurrency=max_concurrency)
+        finally:
+            # Disable everything that failed during this run in one transaction,
+            # even if other queries raised
+            await flush_disable_requests(self.bot)
 
     @query_loop.before_loop
     async def query_before_loop(self) -> None:
@@ -98,6 +113,12 @@ class StatusCog(
         log.info("Waiting %.2fs before starting query loop...", delay)
         await asyncio.sleep(delay)
 
+    # Expired history only needs to be pruned occasionally,
+    # rather than by every status on every query
+    @tasks.loop(minutes=15)
+    async def prune_loop(self) -> None:
+        await prune_history(self.bot)
+
     async def _set_query_interval(self) -> None:
         async with connect_client() as client:
             query_interval = await client.set_default_setting(
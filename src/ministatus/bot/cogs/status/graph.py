@@ -1,134 +1,320 @@
+import asyncio
+import bisect
 import datetime
+import functools
 import io
-import math
-from typing import Sequence, cast
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import cast
 
 import discord
-import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib import dates as mdates, ticker
 from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Figures are reused between graphs since creating them is relatively slow.
+# Each thread gets its own figure so graphs can be rendered concurrently.
+_figure_cache = threading.local()
+
+# Graphs are rendered on a dedicated executor so they don't tie up the
+# default executor, and to limit how many cached figures are kept around
+_graph_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="graph")
+
+# Dates are converted to matplotlib's date numbers, i.e. days since its epoch
+_EPOCH_DATENUM = cast(
+    float,
+    mdates.date2num(datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)),
+)
+
+# Size of the graph in inches, which at 80 DPI is 432x260 pixels
+_GRAPH_SIZE = (5.4, 3.25)
+_GRAPH_DPI = 80
+# Upper bound on the number of pixel columns the plot area spans
+_GRAPH_COLUMNS = 512
+
+# Graphs are uploaded once and replaced soon after, so favour encoding
+# speed over size. Level 1 is ~40% faster than the default of 6 here.
+_PNG_COMPRESS_LEVEL = 1
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Recently rendered PNGs, only accessed from the event loop
+_GRAPH_CACHE_SIZE = 32
+_graph_cache: OrderedDict[tuple, bytes] = OrderedDict()
+# How many times per x tick step the current time is rounded to
+_GRAPH_NOW_DIVISIONS = 60
+
+
+async def render_player_count_graph(
+    timestamps: np.ndarray,
+    counts: np.ndarray,
+    *,
+    status_id: int,
+    colour: int,
+    max_players: int,
+) -> io.BytesIO:
+    """Run :func:`create_player_count_graph()` in the graph executor.
+
+    Recently rendered graphs are cached, so displays showing the same
+    status at the same time can share one render.
+
+    """
+    # History is only appended to or pruned from the start, so its length
+    # and endpoints are enough to tell if it changed
+    first = float(timestamps[0]) if len(timestamps) > 0 else 0.0
+    last = float(timestamps[-1]) if len(timestamps) > 0 else 0.0
+
+    # Ticks are placed relative to the current time, so it has to be part of
+    # the key. Rounding it to a small fraction of the tick step lets renders
+    # close together share a graph without visibly moving their ticks.
+    step = _calculate_date_step(first / 86400, last / 86400)
+    resolution = step * 86400 / _GRAPH_NOW_DIVISIONS
+    now_ts = discord.utils.utcnow().timestamp() // resolution * resolution
+    now = datetime.datetime.fromtimestamp(now_ts, datetime.timezone.utc)
+
+    key = (status_id, len(timestamps), first, last, now_ts, colour, max_players)
+
+    png = _graph_cache.get(key)
+    if png is not None:
+        _graph_cache.move_to_end(key)
+        return io.BytesIO(png)
+
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(
+        _graph_executor,
+        functools.partial(
+            create_player_count_graph,
+            timestamps,
+            counts,
+            colour=colour,
+            max_players=max_players,
+            now=now,
+        ),
+    )
+
+    _graph_cache[key] = f.getvalue()
+    if len(_graph_cache) > _GRAPH_CACHE_SIZE:
+        _graph_cache.popitem(last=False)
+
+    return f
 
 
 def create_player_count_graph(
-    datapoints: Sequence[tuple[datetime.datetime, int]],
+    timestamps: np.ndarray,
+    counts: np.ndarray,
     *,
     colour: int,
     max_players: int,
+    now: datetime.datetime | None = None,
 ) -> io.BytesIO:
-    now = discord.utils.utcnow()
-    if len(datapoints) < 2:
-        datapoints = [
-            (now - datetime.timedelta(minutes=1), 0),
-            (now, 0),
-        ]
+    """Render a graph of player counts over time as a PNG.
+
+    Timestamps are given in seconds since the epoch, in chronological order,
+    alongside an array of the same length with each player count.
+
+    """
+    if now is None:
+        now = discord.utils.utcnow()
+
+    if len(timestamps) < 2:
+        timestamps = np.array([now.timestamp() - 60, now.timestamp()])
+        counts = np.zeros(2, np.int64)
 
     assert 0 <= colour <= 0xFFFFFF
     colour_hex = f"#{colour:06X}"
 
-    fig, ax = plt.subplots()
+    canvas, ax = _get_cached_subplots()
 
     # Plot player counts
-    x = [p[0] for p in datapoints]
-    y = [p[1] for p in datapoints]
-    x_min = cast(float, mdates.date2num(min(x)))
-    x_max = cast(float, mdates.date2num(max(x)))
+    x = timestamps / 86400 + _EPOCH_DATENUM
+    y = counts
+    x_min = float(x[0])
+    x_max = float(x[-1])
+    x, y = _decimate_m4(x, y, x_min, x_max, _GRAPH_COLUMNS)
     ax.plot(x, y, colour_hex)  # , marker='.') # type: ignore
 
     # Set limits and fill under the line
     ax.set_xlim(x_min, x_max)  # type: ignore
-    ax.set_ylim(0, max(max_players, max(y), 1))
-    ax.fill_between(
-        x,  # type: ignore
-        y,  # type: ignore
-        color=colour_hex + "55",
-    )
+    y_max = int(y.max())
+    ax.set_ylim(0, max(max_players, y_max, 1))
+    if y_max > 0:  # Nothing to fill for servers that were always empty
+        ax.fill_between(x, y, color=colour_hex + "55")
 
-    now_num = cast(float, mdates.date2num(now))
+    now_num = now.timestamp() / 86400 + _EPOCH_DATENUM
     _set_relative_date_xticks(ax, now_num, x_min, x_max)
 
     # Set yticks
     y_step = _calculate_max_players_y_step(max_players)
     ax.yaxis.set_major_locator(ticker.MultipleLocator(y_step))
 
-    # Add grid
+    # Clearing the axes hides the grid, but the rest of its style is kept
+    ax.grid(True)
+    ax.tick_params(labelcolor=colour_hex)
+
+    # Encode the canvas directly, skipping the overhead of savefig().
+    # The figure was already made transparent and sized when created.
+    canvas.draw()
+    png = _encode_png(np.asarray(canvas.buffer_rgba()))
+    return io.BytesIO(png)
+
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an RGBA image as a PNG.
+
+    Unlike Pillow, rows aren't filtered before compression, which makes
+    the image slightly larger but is much faster to encode.
+
+    """
+    height, width, _ = rgba.shape
+
+    # Each row starts with its filter type, which is always 0 (none)
+    rows = np.zeros((height, width * 4 + 1), np.uint8)
+    rows[:, 1:] = rgba.reshape(height, -1)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    data = zlib.compress(rows.tobytes(), _PNG_COMPRESS_LEVEL)
+    return b"".join(
+        (
+            _PNG_SIGNATURE,
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"IDAT", data),
+            _png_chunk(b"IEND", b""),
+        )
+    )
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(data, zlib.crc32(tag))
+    return b"".join((struct.pack(">I", len(data)), tag, data, struct.pack(">I", crc)))
+
+
+def _get_cached_subplots() -> tuple[FigureCanvasAgg, Axes]:
+    try:
+        canvas, ax = _figure_cache.canvas, _figure_cache.ax
+    except AttributeError:
+        canvas, ax = _create_subplots()
+        _figure_cache.canvas, _figure_cache.ax = canvas, ax
+
+    ax.clear()
+    return canvas, ax
+
+
+def _create_subplots() -> tuple[FigureCanvasAgg, Axes]:
+    # Figures are drawn directly on an Agg canvas without pyplot,
+    # so they aren't tracked by its global figure manager
+    fig = Figure(figsize=_GRAPH_SIZE, dpi=_GRAPH_DPI)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    fig.patch.set_facecolor("none")
+    ax.set_facecolor("none")
+
+    # Use a fixed layout with enough room for six-digit y tick labels,
+    # rather than measuring the labels with tight_layout()
+    fig.subplots_adjust(left=0.11, right=0.97, top=0.97, bottom=0.09)
+
+    # Style the grid, ticks, and spines once, since ax.clear() keeps them
     ax.set_axisbelow(True)
     ax.grid(color="#707070", alpha=0.4)
-
-    # Color the ticks and make spine invisible
     for spine in ax.spines.values():
         spine.set_color("#00000000")
-    ax.tick_params(labelsize=9, color="#70707066", labelcolor=colour_hex)
-
-    set_axes_aspect(ax, 9 / 16, "box")
-
-    f = io.BytesIO()
-    fig.savefig(
-        f,
-        format="png",
-        bbox_inches="tight",
-        pad_inches=0.1,
-        dpi=80,
-        transparent=True,
-    )
-    # bbox_inches, pad_inches: removes padding around the graph
-    f.seek(0)
+    ax.tick_params(labelsize=9, color="#70707066")
 
-    plt.close(fig)
-    return f
+    return canvas, ax
 
 
-def _set_relative_date_xticks(ax: Axes, now: float, x_min: float, x_max: float) -> None:
-    def format_hour(x: float, pos: float) -> str:
-        # Generate ticks based exactly on the tick position and step.
-        # Floating point errors can still occur from this, so unfortunately
-        # we have to round anyway.
-
-        pos += 1  # bump 0-indexed to 1-indexed for our math
-
-        if step >= 1:
-            days = round(pos * step)
-            return f"{days}d"
-        elif step >= 1 / 24:
-            hours = round(pos * step * 24)
-            return f"{hours}h"
-        elif step >= 1 / 24 / 60:
-            minutes = round(pos * step * 24 * 60)
-            return f"{minutes}m"
-
-        seconds = round(pos * step * 24 * 60 * 60)
-        return f"{seconds}s"
+def _decimate_m4(
+    x: np.ndarray,
+    y: np.ndarray,
+    x_min: float,
+    x_max: float,
+    columns: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce datapoints to what can be seen at the given resolution.
+
+    For each column, only the first, last, minimum, and maximum points
+    are kept, which draws the same line with at most 4 points per column.
+
+    """
+    if len(x) <= columns * 4 or x_max <= x_min:
+        return x, y
+
+    bins = ((x - x_min) / (x_max - x_min) * columns).astype(np.intp)
+    np.minimum(bins, columns - 1, out=bins)
+
+    # Sort by column then player count, so the first and last point
+    # of each column in this order are its minimum and maximum
+    by_value = np.lexsort((y, bins))
+    _, first_value = np.unique(bins[by_value], return_index=True)
+    last_value = np.r_[first_value[1:], len(by_value)] - 1
 
+    _, first_index = np.unique(bins, return_index=True)
+    _, last_index = np.unique(bins[::-1], return_index=True)
+    last_index = len(bins) - 1 - last_index
+
+    keep = np.unique(
+        np.concatenate(
+            (
+                first_index,
+                last_index,
+                by_value[first_value],
+                by_value[last_value],
+            )
+        )
+    )
+    return x[keep], y[keep]
+
+
+def _set_relative_date_xticks(ax: Axes, now: float, x_min: float, x_max: float) -> None:
     step = _calculate_date_step(x_min, x_max)
     start = x_max - step + (now - x_max)
-    ax.set_xticks(np.arange(start, x_min, -step))
-    ax.xaxis.set_major_formatter(format_hour)
+    ticks = np.arange(start, x_min, -step)
+
+    # Generate labels based exactly on the tick position and step.
+    # Floating point errors can still occur from this, so unfortunately
+    # we have to round anyway.
+    if step >= 1:
+        unit, scale = "d", step
+    elif step >= 1 / 24:
+        unit, scale = "h", step * 24
+    elif step >= 1 / 24 / 60:
+        unit, scale = "m", step * 24 * 60
+    else:
+        unit, scale = "s", step * 24 * 60 * 60
+
+    # Labelling every tick up front avoids a Python callback per tick
+    values = np.rint(np.arange(1, len(ticks) + 1) * scale).astype(np.int64)
+    labels = [f"{v}{unit}" for v in values.tolist()]
+    ax.set_xticks(ticks, labels)
 
 
 def _calculate_date_step(x_min: float, x_max: float) -> float:
     # Figure out a reasonable interval to use for x-ticks.
     # Remember that date2num() = 1 day, so 1 / 24 is 1 hour.
     span_days = x_max - x_min
-    max_ticks = 16
-    possible_steps = [
-        1 / 24 / 60,  # 1min
-        1 / 24 / 30,  # 2min
-        1 / 24 / 12,  # 5min
-        1 / 24 / 4,  # 15min
-        1 / 24,  # 1h
-        1 / 12,  # 2h
-        1 / 6,  # 4h
-        1 / 3,  # 8h
-        1,  # 1d
-        3,  # 3d
-        30,  # 39d
-    ]
+    i = bisect.bisect_left(_DATE_STEP_MAX_SPANS, span_days)
+    return _DATE_STEPS[min(i, len(_DATE_STEPS) - 1)]
 
-    for pstep in possible_steps:
-        if span_days / pstep <= max_ticks:
-            return pstep
 
-    return possible_steps[-1]
+_DATE_STEP_MAX_TICKS = 16
+_DATE_STEPS = [
+    1 / 24 / 60,  # 1min
+    1 / 24 / 30,  # 2min
+    1 / 24 / 12,  # 5min
+    1 / 24 / 4,  # 15min
+    1 / 24,  # 1h
+    1 / 12,  # 2h
+    1 / 6,  # 4h
+    1 / 3,  # 8h
+    1,  # 1d
+    3,  # 3d
+    30,  # 39d
+]
+# The longest span each step can cover without exceeding the max ticks
+_DATE_STEP_MAX_SPANS = [step * _DATE_STEP_MAX_TICKS for step in _DATE_STEPS]
 
 
 def _calculate_max_players_y_step(max_players: int) -> int:
@@ -146,22 +332,4 @@ def _calculate_max_players_y_step(max_players: int) -> int:
     if mod_step_n:
         mod_step_n.sort()
         return mod_step_n[0][2]
-    return math.ceil(max_players / max_ticks) or 5
-
-
-def set_axes_aspect(ax: Axes, ratio: int | float, *args, **kwargs) -> None:
-    """Set an Axes's aspect ratio.
-
-    Extra arguments are passed through to `ax.set_aspect()`.
-
-    :param ax: The Axes to set the aspect ratio for.
-    :param ratio: The ratio of height to width.
-
-    """
-    # https://www.statology.org/matplotlib-aspect-ratio/
-    x_left, x_right = ax.get_xlim()
-    y_low, y_high = ax.get_ylim()
-    x_size = x_right - x_left
-    y_size = y_low - y_high
-    current_ratio = abs(x_size / y_size)
-    ax.set_aspect(current_ratio * ratio, *args, **kwargs)
+    return -(-max_players // max_ticks) or 5
@@ -24,10 +24,19 @@ async def check_channel_permissions(
 
 
 def get_missing_permissions(x: discord.Permissions, y: discord.Permissions) -> str:
-    return format_permissions(~(x & y) & y)
+    missing = ~x.value & y.value
+    if not missing:
+        return ""
+    return format_permissions(discord.Permissions(missing))
 
 
 def format_permissions(permissions: discord.Permissions) -> str:
-    return ", ".join(
-        sorted(perm.replace("_", " ").title() for perm, value in permissions if value)
-    )
+    value = permissions.value
+    return ", ".join(name for name, flag in _PERMISSION_NAMES if value & flag)
+
+
+# Display names for each permission, sorted by name
+_PERMISSION_NAMES = sorted(
+    (perm.replace("_", " ").title(), discord.Permissions.VALID_FLAGS[perm])
+    for perm, _ in discord.Permissions.all()
+)
@@ -3,13 +3,15 @@ from __future__ import annotations
 import asyncio
 import base64
 import datetime
+import functools
 import json
 import logging
 import re
 from contextlib import AsyncExitStack, suppress
 from dataclasses import dataclass
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Self, assert_never, cast
+from ipaddress import ip_address
+from typing import TYPE_CHECKING, Self, assert_never, cast
 
 import aiohttp
 import discord
@@ -19,7 +21,7 @@ from dns.rdatatype import A, AAAA, RdataType, SRV
 from dns.rdtypes.IN.A import A as ARecord
 from dns.rdtypes.IN.AAAA import AAAA as AAAARecord
 from dns.rdtypes.IN.SRV import SRV as SRVRecord
-from dns.resolver import Answer, Cache, NoAnswer, NoNameservers, NXDOMAIN, YXDOMAIN
+from dns.resolver import Answer, LRUCache, NoAnswer, NoNameservers, NXDOMAIN, YXDOMAIN
 from little_a2s import (
     Arma3Rules,
     AsyncA2S,
@@ -29,16 +31,16 @@ from little_a2s import (
 )
 from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
-from ministatus.bot.dt import past, utcnow
+from ministatus.bot.dt import utcnow
 from ministatus.db import (
+    DatabaseClient,
+    Record,
     SQLiteConnection,
     Status,
     StatusDisplay,
     StatusMod,
     StatusQuery,
     StatusQueryType,
-    connect,
-    connect_client,
     status_mod_list_adapter,
 )
 
@@ -55,17 +57,23 @@ if TYPE_CHECKING:
 
 log = logging.getLogger(__name__)
 
+DISPLAY_MAX_CONCURRENCY = 8
+DNS_MAX_CONCURRENCY = 32
 DNS_TIMEOUT = 3
 HISTORY_EXPIRES_AFTER = datetime.timedelta(days=30)
 HISTORY_PLAYERS_EXPIRES_AFTER = datetime.timedelta(hours=1)
 QUERY_DEAD_AFTER = datetime.timedelta(days=1)
 QUERY_TIMEOUT = 3
+HTTP_MAX_CONCURRENCY = 16
 HTTP_TIMEOUT = aiohttp.ClientTimeout(3)
 
-FIVEM_COLOUR_CODE = re.compile(r"\^\d")
+FIVEM_COLOUR_CODE = re.compile(r"\^\d", re.ASCII)
+MINECRAFT_FAVICON_PREFIX = "data:image/png;base64,"
 
 _resolver = Resolver()
-_resolver.cache = Cache()
+# Bounded so that many distinct hostnames can't grow the cache forever
+_resolver.cache = LRUCache(max_size=4096)
+_resolver_pending: dict[tuple[str, RdataType], asyncio.Task[Answer | None]] = {}
 
 
 async def run_query_jobs(
@@ -75,26 +83,36 @@ async def run_query_jobs(
 ) -> None:
     guild_ids = [guild.id for guild in bot.guilds]
 
-    async with connect_client() as client:
+    async with bot.acquire_db_conn(transaction="read") as conn:
+        client = DatabaseClient(conn)
         statuses = await client.get_bulk_statuses_by_guilds(
             *guild_ids,
             only_enabled=True,
             with_relationships=True,
         )
+        downtimes = await _get_bulk_downtime(conn, statuses)
 
     if not statuses:
         return
 
     try:
-        await _run_query_jobs(bot, statuses, max_concurrency=max_concurrency)
+        await _run_query_jobs(
+            bot,
+            statuses,
+            downtimes,
+            max_concurrency=max_concurrency,
+        )
     except* (
         aiohttp.ClientOSError,  # sometimes raised by message.edit()
         aiohttp.ServerDisconnectedError,  # sometimes raised by message.edit()
         discord.DiscordServerError,
         discord.RateLimited,
     ) as eg:
-        # Ergh, drop all other exceptions so tasks.loop() can handle it
+        # Ergh, drop all other exceptions so tasks.loop() can handle it.
+        # Display updates are grouped per status, so look inside those too.
         e = eg.exceptions[0]
+        while isinstance(e, BaseExceptionGroup):
+            e = e.exceptions[0]
         log.warning("One or more status queries failed (%s)", type(e).__name__)
         raise e from None
 
@@ -102,21 +120,22 @@ async def run_query_jobs(
 async def _run_query_jobs(
     bot: Bot,
     statuses: list[Status],
+    downtimes: dict[int, DowntimeStatus],
     *,
     max_concurrency: int,
 ) -> None:
-    tasks = []
     lock = asyncio.BoundedSemaphore(max_concurrency)
-    async with QueryContext(bot) as ctx, asyncio.TaskGroup() as tg:
-        for status in statuses:
-            tasks.append(tg.create_task(query_status(ctx, status, lock)))
-
-            # Let all tasks run first, and collect any errors to raise afterwards
-        await asyncio.wait(tasks)
+    async with QueryContext(bot, downtimes) as ctx:
+        # Let all jobs run first, and collect any errors to raise afterwards.
+        # Unlike TaskGroup, gather() won't cancel other jobs if one fails.
+        results = await asyncio.gather(
+            *(query_status(ctx, status, lock) for status in statuses),
+            return_exceptions=True,
+        )
 
-    exceptions = [e for t in tasks if (e := t.exception()) is not None]
+    exceptions = [e for e in results if isinstance(e, BaseException)]
     if exceptions:
-        raise ExceptionGroup(f"{len(exceptions)} query job(s) failed", exceptions)
+        raise BaseExceptionGroup(f"{len(exceptions)} query job(s) failed", exceptions)
 
 
 async def query_status(
@@ -136,9 +155,17 @@ async def query_status(
         else:
             await record_offline(ctx, status)
 
-        for display in status.displays:
+    # Displays only talk to Discord, so they don't need to hold up other
+    # statuses waiting to be queried, and can be updated concurrently.
+    # Queries still run one at a time, since later ones are only fallbacks.
+    async def update(display: StatusDisplay) -> None:
+        async with ctx.display_limit:
             await maybe_update_display(ctx.bot, status, display)
 
+    async with asyncio.TaskGroup() as tg:
+        for display in status.displays:
+            tg.create_task(update(display))
+
 
 async def maybe_query(
     ctx: QueryContext,
@@ -149,17 +176,17 @@ async def maybe_query(
         info = await send_query(ctx, query)
     except FailedQueryError as e:
         log.debug("Query #%d failed: %s", query.status_query_id, e, exc_info=e)
-        if await set_query_failed(query):
+        if await set_query_failed(ctx.bot, query):
             reason = "Offline for extended period of time"
-            return await disable_query(ctx.bot, status, query, reason)
+            disable_query(ctx.bot, status, query, reason)
     except InvalidQueryError as e:
-        await set_query_failed(query)
-        return await disable_query(ctx.bot, status, query, str(e))
+        await set_query_failed(ctx.bot, query)
+        disable_query(ctx.bot, status, query, str(e))
     except Exception:
-        await set_query_failed(query)
+        await set_query_failed(ctx.bot, query)
         raise
     else:
-        await set_query_success(query)
+        await set_query_success(ctx.bot, query)
         return info
 
 
@@ -169,48 +196,67 @@ async def send_query(ctx: QueryContext, query: StatusQuery) -> Info | None:
     elif query.type == StatusQueryType.ARMA_REFORGER:
         return await query_source(ctx, query)
     elif query.type == StatusQueryType.FIVEM:
-        return await query_fivem(ctx.bot.session, query)
+        return await query_fivem(ctx, query)
     elif query.type == StatusQueryType.MINECRAFT_BEDROCK:
-        return await query_minecraft_bedrock(query)
+        return await query_minecraft_bedrock(ctx, query)
     elif query.type == StatusQueryType.MINECRAFT_JAVA:
-        return await query_minecraft_java(query)
+        return await query_minecraft_java(ctx, query)
     elif query.type == StatusQueryType.SOURCE:
         return await query_source(ctx, query)
     elif query.type == StatusQueryType.TEAMSPEAK_3:
-        return await query_teamspeak_3(query)
+        return await query_teamspeak_3(ctx, query)
     elif query.type == StatusQueryType.PROJECT_ZOMBOID:
         return await query_source(ctx, query)
     else:
         assert_never(query.type)
 
 
-async def query_fivem(session: aiohttp.ClientSession, query: StatusQuery) -> Info:
-    async def get(filename: str) -> Any:
+async def query_fivem(ctx: QueryContext, query: StatusQuery) -> Info:
+    async def get(filename: str) -> bytes:
         params = {"v": int(now.timestamp())}
         url = f"https://{host}:{port}/{filename}"
         # NOTE: several servers use self-signed certificates, so ssl=False is needed
-        return await _http_get_json(session, url, params=params, ssl=False)
-
-    host, port = await resolve_host(query)
+        async with ctx.http_limit:
+            return await _http_get_bytes(
+                ctx.bot.session,
+                url,
+                params=params,
+                ssl=False,
+            )
+
+    host, port = await resolve_host(ctx, query)
     now = utcnow()
 
-    dynamic = await get("dynamic.json")
-    info = await get("info.json")
-    players = await get("players.json")
+    dynamic, info, players = await asyncio.gather(
+        get("dynamic.json"),
+        get("info.json"),
+        get("players.json"),
+    )
+
+    # Servers can respond with an empty body while restarting, which isn't
+    # malformed JSON so much as a temporary failure
+    message = "Unexpected response format; did server shutdown?"
+    if not (dynamic.strip() and info.strip() and players.strip()):
+        raise FailedQueryError(message)
 
+    # Validate the raw bytes directly, skipping an intermediate parse
+    # into Python objects by the json module
     try:
-        dynamic = FiveMDynamic.model_validate(dynamic)
-        info = FiveMInfo.model_validate(info)
-        players = fivem_players_list_adapter.validate_python(players)
+        dynamic = FiveMDynamic.model_validate_json(dynamic)
+        info = FiveMInfo.model_validate_json(info)
+        players = fivem_players_list_adapter.validate_json(players)
     except ValidationError as e:
-        message = "Unexpected response format; did server shutdown?"
+        if any(err["type"] == "json_invalid" for err in e.errors()):
+            raise InvalidQueryError("Server responded with malformed JSON") from e
         raise FailedQueryError(message) from e
 
     vars = info.vars
     thumbnail = base64.b64decode(info.icon) if info.icon else None
 
     title = dynamic.hostname or vars.sv_projectName or ""
-    title = FIVEM_COLOUR_CODE.sub("", title).strip()
+    if "^" in title:
+        title = FIVEM_COLOUR_CODE.sub("", title)
+    title = title.strip()
     version = dynamic.iv or info.version
     players = [Player(name=p.name) for p in players if p.name]
 
@@ -228,10 +274,10 @@ async def query_fivem(session: aiohttp.ClientSession, query: StatusQuery) -> Inf
     )
 
 
-async def query_minecraft_bedrock(query: StatusQuery) -> Info:
+async def query_minecraft_bedrock(ctx: QueryContext, query: StatusQuery) -> Info:
     from opengsq import RakNet
 
-    host, port = await resolve_host(query)
+    host, port = await resolve_host(ctx, query)
     proto = RakNet(host, port, QUERY_TIMEOUT)
 
     try:
@@ -253,11 +299,11 @@ async def query_minecraft_bedrock(query: StatusQuery) -> Info:
     )
 
 
-async def query_minecraft_java(query: StatusQuery) -> Info:
+async def query_minecraft_java(ctx: QueryContext, query: StatusQuery) -> Info:
     # https://minecraft.wiki/w/Java_Edition_protocol/Server_List_Ping
     from opengsq import Minecraft
 
-    host, port = await resolve_host(query)
+    host, port = await resolve_host(ctx, query)
     proto = Minecraft(host, port, QUERY_TIMEOUT)
 
     try:
@@ -266,9 +312,9 @@ async def query_minecraft_java(query: StatusQuery) -> Info:
         raise FailedQueryError("Query timed out") from e
 
     favicon = cast(str, status.get("favicon", ""))
-    if favicon.startswith("data:image/png;base64,"):
-        favicon = favicon.removeprefix("data:image/png;base64,")
-        thumbnail = base64.decodebytes(favicon.encode())
+    if favicon.startswith(MINECRAFT_FAVICON_PREFIX):
+        # b64decode() accepts ASCII strings, so there's no need to encode first
+        thumbnail = base64.b64decode(favicon[len(MINECRAFT_FAVICON_PREFIX) :])
     else:
         thumbnail = None
 
@@ -301,7 +347,7 @@ async def query_minecraft_java(query: StatusQuery) -> Info:
 
 
 async def query_source(ctx: QueryContext, query: StatusQuery) -> Info:
-    host, port = await resolve_host(query)
+    host, port = await resolve_host(ctx, query)
     proto = await ctx.start_source(host)
 
     try:
@@ -332,13 +378,13 @@ async def query_source(ctx: QueryContext, query: StatusQuery) -> Info:
     )
 
 
-async def query_teamspeak_3(query: StatusQuery) -> Info:
+async def query_teamspeak_3(ctx: QueryContext, query: StatusQuery) -> Info:
     from opengsq import TeamSpeak3
 
     # In this context, "game port" is the TeamSpeak query port and "query port"
     # is the TeamSpeak voice port. SRV records are looked up for the voice port.
     query_port = query.game_port or 10011
-    host, voice_port = await resolve_host(query)
+    host, voice_port = await resolve_host(ctx, query)
     proto = TeamSpeak3(host, query_port, voice_port, QUERY_TIMEOUT)
 
     try:
@@ -367,12 +413,12 @@ async def query_teamspeak_3(query: StatusQuery) -> Info:
     )
 
 
-async def _http_get_json(session: aiohttp.ClientSession, *args, **kwargs) -> Any:
+async def _http_get_bytes(session: aiohttp.ClientSession, *args, **kwargs) -> bytes:
     kwargs.setdefault("timeout", HTTP_TIMEOUT)
     try:
         async with session.get(*args, **kwargs) as res:
             res.raise_for_status()
-            return await res.json(content_type=None)
+            return await res.read()
     except TimeoutError as e:
         raise FailedQueryError("HTTP request timed out") from e
     except aiohttp.ClientConnectorError as e:
@@ -382,28 +428,17 @@ async def _http_get_json(session: aiohttp.ClientSession, *args, **kwargs) -> Any
         if 400 <= e.status < 500:  # Maybe support 429 ratelimiting?
             raise InvalidQueryError(message) from e
         raise FailedQueryError(message) from e
-    except json.JSONDecodeError as e:
-        raise InvalidQueryError("Server responded with malformed JSON") from e
 
 
-async def resolve_host(query: StatusQuery) -> tuple[str, int]:
-    from ipaddress import IPv4Address, IPv6Address
-
+async def resolve_host(ctx: QueryContext, query: StatusQuery) -> tuple[str, int]:
     host = query.host
     query_port = query.query_port
     type = query.type
 
-    ip = None
-    with suppress(ValueError):
-        ip = IPv4Address(host)
-
-    if ip is None:
-        with suppress(ValueError):
-            ip = IPv6Address(host)
-
-    if ip is not None and query_port < 1:
+    is_ip = _is_ip_address(host)
+    if is_ip and query_port < 1:
         raise InvalidQueryError("IP address was provided without a query port")
-    elif ip is not None:
+    elif is_ip:
         return host, query_port
 
     host_srv = None
@@ -419,36 +454,105 @@ async def resolve_host(query: StatusQuery) -> tuple[str, int]:
     elif type == StatusQueryType.TEAMSPEAK_3:
         host_srv = f"_ts3._udp.{host}"
 
+    if not host_srv and query_port < 1:
+        raise InvalidQueryError("Domain name provided without a query port")
+
     # See also https://github.com/py-mine/mcstatus/blob/v12.0.6/mcstatus/dns.py
     # NOTE: there could be multiple DNS records, but we're always returning the first
 
-    if host_srv and (answers := await _resolve(host_srv, SRV)):
-        record = cast(SRVRecord, answers[0])
-        log.debug("Resolved query #%d with SRV record", query.status_query_id)
-        host = str(record.target).rstrip(".")
-        query_port = record.port + srv_offset
+    # Look up the host's addresses while waiting on its SRV record,
+    # since they're needed anyway if it doesn't have one
+    lookups = _start_address_lookups(ctx, host, ipv6=ipv6_allowed)
+    try:
+        if host_srv and (answers := await _resolve(ctx, host_srv, SRV)):
+            record = cast(SRVRecord, answers[0])
+            log.debug("Resolved query #%d with SRV record", query.status_query_id)
+            target = str(record.target).rstrip(".")
+            query_port = record.port + srv_offset
+
+            if target != host:
+                _cancel_lookups(lookups)
+                host = target
+                lookups = _start_address_lookups(ctx, host, ipv6=ipv6_allowed)
+
+        if query_port < 1:
+            raise InvalidQueryError(
+                "Query port not defined and no SRV DNS record found"
+            )
+
+        # IPv4 is still preferred when the host has both kinds of address
+        for rdtype, task in lookups:
+            if answers := await task:
+                record = cast(ARecord | AAAARecord, answers[0])
+                log.debug(
+                    "Resolved query #%d with %s record",
+                    query.status_query_id,
+                    rdtype.name,
+                )
+                return str(record.address), query_port
+    finally:
+        _cancel_lookups(lookups)
 
-    if host_srv and query_port < 1:
-        raise InvalidQueryError("Query port not defined and no SRV DNS record found")
-    elif query_port < 1:
-        raise InvalidQueryError("Domain name provided without a query port")
+    raise InvalidQueryError("DNS name does not exist")
 
-    if answers := await _resolve(host, A):
-        record = cast(ARecord, answers[0])
-        log.debug("Resolved query #%d with A record", query.status_query_id)
-        return str(record.address), query_port
 
-    if ipv6_allowed and (answers := await _resolve(host, AAAA)):
-        record = cast(AAAARecord, answers[0])
-        log.debug("Resolved query #%d with AAAA record", query.status_query_id)
-        return str(record.address), query_port
+# Hosts rarely change between queries, so remember which ones are IP addresses
+@functools.lru_cache(maxsize=4096)
+def _is_ip_address(host: str) -> bool:
+    with suppress(ValueError):
+        ip_address(host)
+        return True
+    return False
 
-    raise InvalidQueryError("DNS name does not exist")
+
+def _start_address_lookups(
+    ctx: QueryContext,
+    host: str,
+    *,
+    ipv6: bool,
+) -> list[tuple[RdataType, asyncio.Task[Answer | None]]]:
+    rdtypes = (A, AAAA) if ipv6 else (A,)
+    lookups = [(t, asyncio.create_task(_resolve(ctx, host, t))) for t in rdtypes]
+    for _, task in lookups:
+        # Lookups can be discarded before they're awaited,
+        # so retrieve their exceptions to avoid warnings about them
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return lookups
+
+
+def _cancel_lookups(
+    lookups: list[tuple[RdataType, asyncio.Task[Answer | None]]],
+) -> None:
+    for _, task in lookups:
+        task.cancel()
 
 
-async def _resolve(qname: str, rdtype: RdataType) -> Answer | None:
+async def _resolve(
+    ctx: QueryContext,
+    qname: str,
+    rdtype: RdataType,
+) -> Answer | None:
+    # Statuses sharing a host are queried at the same time, before the cache
+    # has any answer for them, so identical lookups in flight are coalesced
+    key = (qname, rdtype)
+    task = _resolver_pending.get(key)
+    if task is None:
+        task = asyncio.create_task(_resolve_uncoalesced(ctx, qname, rdtype))
+        task.add_done_callback(lambda _: _resolver_pending.pop(key, None))
+        _resolver_pending[key] = task
+
+    # Shielded so one cancelled query doesn't cancel the lookup for the rest
+    return await asyncio.shield(task)
+
+
+async def _resolve_uncoalesced(
+    ctx: QueryContext,
+    qname: str,
+    rdtype: RdataType,
+) -> Answer | None:
     try:
-        return await _resolver.resolve(qname, rdtype, lifetime=DNS_TIMEOUT)
+        async with ctx.dns_limit:
+            return await _resolver.resolve(qname, rdtype, lifetime=DNS_TIMEOUT)
     except Timeout as e:
         log.warning("DNS lookup timed out after %.2fs", DNS_TIMEOUT)
         raise FailedQueryError("DNS lookup timed out") from e
@@ -461,9 +565,14 @@ async def _resolve(qname: str, rdtype: RdataType) -> Answer | None:
         raise InvalidQueryError("DNS name is too long") from e
 
 
-async def set_query_failed(query: StatusQuery) -> bool:
+async def set_query_failed(bot: Bot, query: StatusQuery) -> bool:
+    # failed_at is only changed by these functions while querying, so the
+    # values loaded at the start of the run let us skip redundant UPDATEs
     now = utcnow()
-    async with connect() as conn:
+    if query.failed_at is not None:
+        return now - query.failed_at > QUERY_DEAD_AFTER
+
+    async with bot.acquire_db_conn() as conn:
         failed_at = await conn.fetchval(
             "UPDATE status_query SET failed_at = COALESCE(failed_at, $1) "
             "WHERE status_query_id = $2 RETURNING failed_at",
@@ -474,8 +583,11 @@ async def set_query_failed(query: StatusQuery) -> bool:
         return now - failed_at > QUERY_DEAD_AFTER
 
 
-async def set_query_success(query: StatusQuery) -> None:
-    async with connect() as conn:
+async def set_query_success(bot: Bot, query: StatusQuery) -> None:
+    if query.failed_at is None:
+        return
+
+    async with bot.acquire_db_conn() as conn:
         await conn.execute(
             "UPDATE status_query SET failed_at = NULL WHERE status_query_id = $1",
             query.status_query_id,
@@ -484,12 +596,9 @@ async def set_query_success(query: StatusQuery) -> None:
 
 async def record_offline(ctx: QueryContext, status: Status) -> None:
     log.debug("Recording status #%d as offline", status.status_id)
-    await prune_history(status)
 
-    # Use transaction="write" to eagerly lock the database with a timeout,
-    # since our transaction starts with a read.
-    async with connect(transaction="write") as conn:
-        downtime = await _check_downtime(conn, status)
+    downtime = ctx.downtimes[status.status_id]
+    async with ctx.bot.acquire_db_conn(transaction="write") as conn:
         await conn.execute(
             "INSERT INTO status_history (created_at, status_id, online, down) "
             "VALUES ($1, $2, $3, $4) RETURNING status_history_id",
@@ -506,12 +615,20 @@ async def record_offline(ctx: QueryContext, status: Status) -> None:
 async def record_info(ctx: QueryContext, status: Status, info: Info) -> None:
     log.debug("Recording status #%d as online", status.status_id)
 
+    # The status was loaded at the start of this run, so unchanged mods
+    # don't have to be encoded and written again on every query
     mods = None
-    if info.mods is not None:
+    if info.mods is not None and info.mods != status.mods:
         mods = status_mod_list_adapter.dump_json(info.mods).decode()
 
-    await prune_history(status)
-    async with connect() as conn:
+    # Thumbnails are often several kilobytes and rarely change,
+    # so don't rebind and rewrite one that's already stored
+    thumbnail = info.thumbnail
+    if thumbnail is not None and thumbnail == status.thumbnail:
+        thumbnail = None
+
+    downtime = ctx.downtimes[status.status_id]
+    async with ctx.bot.acquire_db_conn(transaction="write") as conn:
         await conn.execute(
             "UPDATE status SET "
             "title     = COALESCE($1, title), "
@@ -524,7 +641,7 @@ async def record_info(ctx: QueryContext, status: Status, info: Info) -> None:
             "WHERE status_id =    $8",
             info.title,
             info.address,
-            info.thumbnail,
+            thumbnail,
             info.game,
             info.map,
             mods,
@@ -532,7 +649,6 @@ async def record_info(ctx: QueryContext, status: Status, info: Info) -> None:
             status.status_id,
         )
 
-        downtime = await _check_downtime(conn, status)
         status_history_id = await conn.fetchval(
             "INSERT INTO status_history "
             "(created_at, status_id, online, max_players, num_players, down) "
@@ -545,57 +661,77 @@ async def record_info(ctx: QueryContext, status: Status, info: Info) -> None:
             False,  # a successful query always terminates downtime
         )
 
-        await conn.executemany(
-            "INSERT INTO status_history_player (status_history_id, name) "
-            "VALUES ($1, $2)",
-            ((status_history_id, player.name) for player in info.players),
-        )
+        # Insert every player in one statement, with the names passed
+        # as a single JSON array to stay clear of SQLite's parameter limit
+        if info.players:
+            await conn.execute(
+                "INSERT INTO status_history_player (status_history_id, name) "
+                "SELECT $1, value FROM json_each($2)",
+                status_history_id,
+                json.dumps([player.name for player in info.players]),
+            )
 
     if downtime == DowntimeStatus.DOWNTIME:
         await send_alert_downtime_ended(ctx.bot, status)
 
 
-async def prune_history(status: Status) -> None:
-    # FIXME: should prune periodically instead of on every insert
-    async with connect() as conn:
+async def prune_history(bot: Bot) -> None:
+    log.debug("Pruning expired status history")
+
+    # Matching each status lets SQLite search the (status_id, created_at)
+    # index per status, rather than scanning all of the history
+    now = utcnow()
+    async with bot.acquire_db_conn(transaction="write") as conn:
         await conn.execute(
-            "DELETE FROM status_history WHERE status_id = $1 AND created_at < $2",
-            status.status_id,
-            past(HISTORY_EXPIRES_AFTER),
+            "DELETE FROM status_history "
+            "WHERE status_id IN (SELECT status_id FROM status) AND created_at < $1",
+            now - HISTORY_EXPIRES_AFTER,
         )
         await conn.execute(
-            "DELETE FROM status_history_player WHERE status_history_player_id IN "
-            "(SELECT status_history_player_id FROM status_history_player "
-            "JOIN status_history USING (status_history_id) "
-            "WHERE status_id = $1 AND created_at < $2)",
-            status.status_id,
-            past(HISTORY_PLAYERS_EXPIRES_AFTER),
+            "DELETE FROM status_history_player WHERE status_history_id IN "
+            "(SELECT status_history_id FROM status_history "
+            "WHERE status_id IN (SELECT status_id FROM status) AND created_at < $1)",
+            now - HISTORY_PLAYERS_EXPIRES_AFTER,
         )
 
 
-async def _check_downtime(conn: SQLiteConnection, status: Status) -> DowntimeStatus:
+async def _get_bulk_downtime(
+    conn: SQLiteConnection,
+    statuses: list[Status],
+) -> dict[int, DowntimeStatus]:
     # The idea is if we have three consecutive offline queries, we should
     # consider the server as down, and the server is otherwise online if
     # at least one of the recent queries was successful.
     #
-    # Since this function is called before a new row is inserted,
+    # Since this function is called before new rows are inserted,
     # we'll only select the last two rows and let the caller decide
-    # for the next row if it's uptime or downtime.
+    # for the next row if it's uptime or downtime. Each status only gets
+    # one row per run, so this is checked for all of them upfront.
     #
     # NOTE: downtime is directly affected by query interval
-    history = await conn.fetch(
-        "SELECT online, down FROM status_history WHERE status_id = $1 "
-        "ORDER BY status_history_id DESC LIMIT 2",
-        status.status_id,
+    rows = await conn.fetch(
+        "SELECT h.status_id, h.online, h.down FROM json_each($1) s "
+        "JOIN status_history h ON h.status_history_id IN ("
+        "SELECT status_history_id FROM status_history WHERE status_id = s.value "
+        "ORDER BY status_history_id DESC LIMIT 2)",
+        json.dumps([status.status_id for status in statuses]),
     )
 
-    if any(row["online"] for row in history):
-        return DowntimeStatus.ONLINE
-    elif any(row["down"] for row in history):
-        return DowntimeStatus.DOWNTIME
-    else:
-        # This case also applies to fresh statuses without any history
-        return DowntimeStatus.PENDING_DOWNTIME
+    history: dict[int, list[Record]] = {status.status_id: [] for status in statuses}
+    for row in rows:
+        history[row["status_id"]].append(row)
+
+    downtimes: dict[int, DowntimeStatus] = {}
+    for status_id, recent in history.items():
+        if any(row["online"] for row in recent):
+            downtimes[status_id] = DowntimeStatus.ONLINE
+        elif any(row["down"] for row in recent):
+            downtimes[status_id] = DowntimeStatus.DOWNTIME
+        else:
+            # This case also applies to fresh statuses without any history
+            downtimes[status_id] = DowntimeStatus.PENDING_DOWNTIME
+
+    return downtimes
 
 
 async def maybe_update_display(
@@ -606,19 +742,22 @@ async def maybe_update_display(
     try:
         await update_display(bot, message_id=display.message_id)
     except (discord.Forbidden, discord.NotFound) as e:
-        await set_display_failed(display)
+        await set_display_failed(bot, display)
         reason = str(e)
-        await disable_display(bot, status, display, reason)
+        disable_display(bot, status, display, reason)
     except Exception:
-        await set_display_failed(display)
+        await set_display_failed(bot, display)
         raise
     else:
-        await set_display_success(display)
+        await set_display_success(bot, display)
 
 
-async def set_display_failed(display: StatusDisplay) -> None:
+async def set_display_failed(bot: Bot, display: StatusDisplay) -> None:
+    if display.failed_at is not None:
+        return
+
     now = utcnow()
-    async with connect() as conn:
+    async with bot.acquire_db_conn() as conn:
         await conn.execute(
             "UPDATE status_display SET failed_at = COALESCE(failed_at, $1) "
             "WHERE message_id = $2 RETURNING failed_at",
@@ -627,8 +766,11 @@ async def set_display_failed(display: StatusDisplay) -> None:
         )
 
 
-async def set_display_success(display: StatusDisplay) -> None:
-    async with connect() as conn:
+async def set_display_success(bot: Bot, display: StatusDisplay) -> None:
+    if display.failed_at is None:
+        return
+
+    async with bot.acquire_db_conn() as conn:
         await conn.execute(
             "UPDATE status_display SET failed_at = NULL WHERE message_id = $1",
             display.message_id,
@@ -639,10 +781,19 @@ class QueryContext:
     _a2s_ipv4: AsyncA2S | None = None
     _a2s_ipv6: AsyncA2S | None = None
 
-    def __init__(self, bot: Bot) -> None:
+    def __init__(self, bot: Bot, downtimes: dict[int, DowntimeStatus]) -> None:
         self.bot = bot
+        self.downtimes = downtimes
         self._stack = AsyncExitStack()
 
+        # Cap DNS lookups and HTTP requests apart from the status concurrency,
+        # so a large max concurrency can't flood nameservers or open sockets
+        self.dns_limit = asyncio.Semaphore(DNS_MAX_CONCURRENCY)
+        self.http_limit = asyncio.Semaphore(HTTP_MAX_CONCURRENCY)
+        # Displays aren't limited by the status concurrency at all,
+        # so keep bursts of message edits from hitting Discord's ratelimits
+        self.display_limit = asyncio.Semaphore(DISPLAY_MAX_CONCURRENCY)
+
     async def __aenter__(self) -> Self:
         await self._stack.__aenter__()
         return self
@@ -672,7 +823,7 @@ class QueryContext:
         return self._a2s_ipv6
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class SourceRules:
     mods: list[StatusMod]
 
@@ -714,7 +865,7 @@ class SourceRules:
         return cls(mods=mods)
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Info:
     title: str | None
     address: str
@@ -729,7 +880,7 @@ class Info:
     players: list[Player]
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Player:
     name: str
 
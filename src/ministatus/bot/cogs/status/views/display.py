@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import asyncio
 import datetime
 import logging
 import math
@@ -10,10 +9,11 @@ from io import BytesIO
 from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Self, cast
 
 import discord
+import numpy as np
 from discord import Interaction, SelectOption
 from discord.ui import Button, Select
 
-from ministatus.bot.cogs.status.graph import create_player_count_graph
+from ministatus.bot.cogs.status.graph import render_player_count_graph
 from ministatus.bot.cogs.status.permissions import check_channel_permissions
 from ministatus.bot.db import connect_discord_database_client
 from ministatus.bot.dt import past, utcnow
@@ -443,7 +443,8 @@ class StatusDisplayView(LayoutView):
         clean_history: list[StatusHistory],
     ) -> list[discord.File]:
         # NOTE: A status can have multiple displays, each of which independently
-        #       generates its own images. Perhaps this should be shared?
+        #       generates its own images. Identical graphs rendered around
+        #       the same time are shared by render_player_count_graph().
         now = time.perf_counter()
         if now - self._last_attachment_refresh < self.attachments_interval:
             return []
@@ -455,9 +456,15 @@ class StatusDisplayView(LayoutView):
             f = discord.File(BytesIO(status.thumbnail), "thumbnail.png")
             files.append(f)
 
-        graph = await asyncio.to_thread(
-            create_player_count_graph,
-            [(h.created_at, h.num_players) for h in clean_history],
+        n = len(clean_history)
+        graph = await render_player_count_graph(
+            np.fromiter(
+                (h.created_at.timestamp() for h in clean_history),
+                np.float64,
+                count=n,
+            ),
+            np.fromiter((h.num_players for h in clean_history), np.int64, count=n),
+            status_id=status.status_id,
             colour=display.graph_colour,
             max_players=max((h.max_players for h in clean_history), default=0),
         )
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 from contextlib import asynccontextmanager
 from typing import (
     TYPE_CHECKING,
@@ -109,28 +110,47 @@ class DiscordDatabaseClient:
         only_enabled: bool,
         type: Literal["audit", "downtime"] | None,
     ) -> list[tuple[StatusAlert, discord.abc.MessageableChannel]]:
-        alerts = await self.client.get_bulk_status_alerts(
+        alert_channels = await self.get_bulk_status_alert_channels(
             status_id,
             only_enabled=only_enabled,
+            type=type,
         )
-        alerts = alerts[status_id]
-        alerts = [  # FIXME: should filter this in SQL
-            a
-            for a in alerts
-            if type is None
-            or type == "audit"
-            and a.send_audit
-            or type == "downtime"
-            and a.send_downtime
-        ]
-
-        alert_ids = [a.channel_id for a in alerts]
-        aid = ", ".join("?" * len(alert_ids))
-        channels = await self.client.conn.fetch(
-            f"SELECT channel_id, guild_id FROM discord_channel "
-            f"WHERE channel_id IN ({aid}) ORDER BY channel_id",
-            *alert_ids,
+        return alert_channels[status_id]
+
+    async def get_bulk_status_alert_channels(
+        self,
+        *status_ids: int,
+        only_enabled: bool,
+        type: Literal["audit", "downtime"] | None,
+    ) -> dict[int, list[tuple[StatusAlert, discord.abc.MessageableChannel]]]:
+        bulk_alerts = await self.client.get_bulk_status_alerts(
+            *status_ids,
+            only_enabled=only_enabled,
         )
+        bulk_alerts = {
+            status_id: [  # FIXME: should filter this in SQL
+                a
+                for a in alerts
+                if type is None
+                or type == "audit"
+                and a.send_audit
+                or type == "downtime"
+                and a.send_downtime
+            ]
+            for status_id, alerts in bulk_alerts.items()
+        }
+
+        alert_ids = [a.channel_id for alerts in bulk_alerts.values() for a in alerts]
+        if alert_ids:
+            channels = await self.client.conn.fetch(
+                "SELECT channel_id, guild_id FROM discord_channel "
+                "WHERE channel_id IN (SELECT value FROM json_each($1)) "
+                "ORDER BY channel_id",
+                json.dumps(alert_ids),
+            )
+        else:
+            channels = []
+
         channels = {
             c["channel_id"]: self._resolve_channel(
                 channel_id=c["channel_id"],
@@ -140,7 +160,10 @@ class DiscordDatabaseClient:
         }
         channels = cast("dict[int, discord.abc.MessageableChannel]", channels)
 
-        return [(alert, channels[alert.channel_id]) for alert in alerts]
+        return {
+            status_id: [(alert, channels[alert.channel_id]) for alert in alerts]
+            for status_id, alerts in bulk_alerts.items()
+        }
 
     def _resolve_channel(self, *, channel_id: int, guild_id: int | None):
         guild = self.bot.get_guild(guild_id) if guild_id is not None else None
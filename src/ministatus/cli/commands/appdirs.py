@@ -1,11 +1,10 @@
 import click
 
-from ministatus.appdirs import APP_DIRS
-
 
 @click.command()
 def appdirs() -> None:
     """Show directories and important files used by this application."""
+    from ministatus.appdirs import APP_DIRS
 
     def echo_appdirs_path(attr: str) -> None:
         value = getattr(APP_DIRS, attr)
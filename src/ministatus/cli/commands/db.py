@@ -6,8 +6,7 @@ from typing import IO
 
 import click
 
-from ministatus import state
-from ministatus.appdirs import DB_PATH
+from ministatus import appdirs, state
 from ministatus.cli.commands.markers import mark_db
 from ministatus.db import (
     DatabaseEncryptedError,
@@ -63,7 +62,7 @@ def encrypt(password: Secret[str] | None) -> None:
         password = click.prompt("Database Password", hide_input=True, type=Secret)
         assert isinstance(password, Secret)
 
-    with closing(sqlite3.connect(DB_PATH)) as conn:
+    with closing(sqlite3.connect(appdirs.DB_PATH)) as conn:
         try:
             db_encrypt(conn, password, rekey=True)
         except DatabaseEncryptedError:
@@ -83,7 +82,7 @@ def encrypt(password: Secret[str] | None) -> None:
 @click.argument("new", default=None, type=Secret)
 def reencrypt(old: Secret[str] | None, new: Secret[str] | None) -> None:
     """Re-encrypt the database with a new password."""
-    with closing(sqlite3.connect(DB_PATH)) as conn:
+    with closing(sqlite3.connect(appdirs.DB_PATH)) as conn:
         try:
             db_encrypt(conn, Secret(""))
             click.echo(ALREADY_DECRYPTED)
@@ -120,7 +119,7 @@ def decrypt(password: Secret[str] | None) -> None:
     if state.DB_PASSWORD is not None:
         password = state.DB_PASSWORD
 
-    with closing(sqlite3.connect(DB_PATH)) as conn:
+    with closing(sqlite3.connect(appdirs.DB_PATH)) as conn:
         try:
             conn.execute("SELECT * FROM sqlite_schema")
             sys.exit(ALREADY_DECRYPTED)
@@ -209,4 +208,4 @@ def dump(
 @db.command()
 def path() -> None:
     """Print the filepath to the database."""
-    click.secho(DB_PATH, fg="cyan")
+    click.secho(appdirs.DB_PATH, fg="cyan")
@@ -6,7 +6,6 @@ import sys
 
 import click
 
-from ministatus.appdirs import DB_PATH
 from ministatus.bot.dt import past
 from ministatus.cli.commands.markers import mark_async, mark_db
 from ministatus.db import connect, connect_sync
@@ -134,6 +133,8 @@ def imports() -> None:
 )
 def wipe() -> None:
     """Delete the current database."""
+    from ministatus.appdirs import DB_PATH
+
     with connect_sync(transaction=False) as conn:
         conn.execute("PRAGMA locking_mode = EXCLUSIVE")
         conn.execute("PRAGMA journal_mode = DELETE")
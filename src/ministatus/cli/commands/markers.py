@@ -7,8 +7,7 @@ from typing import Any, Callable, Coroutine, ParamSpec, TypeVar
 
 import click
 
-from ministatus import state
-from ministatus.appdirs import DB_PATH
+from ministatus import appdirs, state
 from ministatus.db import (
     DatabaseEncryptedError,
     EncryptionUnsupportedError,
@@ -62,7 +61,7 @@ def _maybe_run_migrations() -> None:
 
 def _maybe_set_database_password() -> None:
     try:
-        with closing(sqlite3.connect(DB_PATH)) as conn:
+        with closing(sqlite3.connect(appdirs.DB_PATH)) as conn:
             encrypt(conn, Secret(""))
     except DatabaseEncryptedError:
         password = click.prompt("Database Password", hide_input=True, type=Secret)
@@ -72,7 +71,7 @@ def _maybe_set_database_password() -> None:
 
 
 def _check_database_password(password: Secret[str]) -> None:
-    with closing(sqlite3.connect(DB_PATH)) as conn:
+    with closing(sqlite3.connect(appdirs.DB_PATH)) as conn:
         try:
             encrypt(conn, Secret(""))
         except DatabaseEncryptedError:
@@ -7,8 +7,7 @@ from contextlib import asynccontextmanager, closing, contextmanager
 from contextvars import ContextVar
 from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator
 
-from ministatus import state
-from ministatus.appdirs import DB_PATH
+from ministatus import appdirs, state
 
 from . import converters as converters
 from .client import DatabaseClient as DatabaseClient
@@ -45,6 +44,7 @@ from .models import (
     DiscordUser as DiscordUser,
     status_mod_list_adapter as status_mod_list_adapter,
 )
+from .pool import ConnectionPool as ConnectionPool
 from .secret import Secret as Secret
 
 if TYPE_CHECKING:
@@ -58,6 +58,20 @@ log = logging.getLogger(__name__)
 _current_conn: ContextVar[SQLiteConnection] = ContextVar("_current_conn")
 _real_connect = sqlite3.connect
 
+# asqlite already enables WAL, where synchronous=NORMAL can only lose
+# the most recent commits on power loss, but never corrupts the database.
+# Memory-mapping lets reads skip copying pages out of the OS cache.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
+# sqlite3 keeps compiled statements in a per-connection LRU cache keyed by
+# the query string, so repeated queries aren't re-parsed. The default of 128
+# can be churned by bulk queries whose text varies with their row count.
+_CACHED_STATEMENTS = 512
+
 
 @asynccontextmanager
 async def connect(
@@ -78,7 +92,7 @@ async def connect(
     start = time.perf_counter()
     token = None
     try:
-        async with _connect(str(DB_PATH)) as conn:
+        async with _connect(str(appdirs.DB_PATH)) as conn:
             wrapped = SQLiteConnection(conn)
             token = _current_conn.set(wrapped)
             async with wrapped.transaction(transaction):
@@ -98,6 +112,17 @@ async def connect(
                 )
 
 
+async def open_connection() -> SQLiteConnection:
+    """Open a long-lived connection to the database.
+
+    Unlike :func:`connect()`, no transaction is started and the caller
+    is responsible for closing the connection once it is no longer needed.
+
+    """
+    conn = await _connect(str(appdirs.DB_PATH))
+    return SQLiteConnection(conn)
+
+
 @asynccontextmanager
 async def connect_client(
     *,
@@ -153,8 +178,11 @@ def _connect(
         return asqlite.Connection(con, queue)
 
     def new_connect(db: str, **kwargs: Any) -> sqlite3.Connection:
+        kwargs.setdefault("cached_statements", _CACHED_STATEMENTS)
         with patch("sqlite3.connect", _connect_and_encrypt):
             conn = asqlite._connect_pragmas(db, **kwargs)
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
 
     return asqlite._ContextManagerMixin(
@@ -169,7 +197,7 @@ def _connect(
 
 @contextmanager
 def connect_sync(*, transaction: bool = True) -> Iterator[sqlite3.Connection]:
-    with closing(_connect_and_encrypt(DB_PATH)) as conn:
+    with closing(_connect_and_encrypt(appdirs.DB_PATH)) as conn:
         if transaction:
             with conn:
                 yield conn
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import datetime
+import json
+from itertools import groupby
+from operator import itemgetter
 from typing import Any
 
-from ministatus.db.connection import SQLiteConnection
+from ministatus.db.connection import Record, SQLiteConnection
 from ministatus.db.models import (
     DiscordChannel,
     DiscordGuild,
@@ -27,6 +30,45 @@ def _validate_status_mods(mods: str | None) -> list[StatusMod] | None:
         return status_mod_list_adapter.validate_json(mods)
 
 
+def _row_to_status_alert(row: Record) -> StatusAlert:
+    return StatusAlert(
+        status_alert_id=row["status_alert_id"],
+        status_id=row["status_id"],
+        channel_id=row["channel_id"],
+        enabled_at=row["enabled_at"],
+        failed_at=row["failed_at"],
+        send_audit=row["send_audit"],
+        send_downtime=row["send_downtime"],
+    )
+
+
+def _row_to_status_display(row: Record) -> StatusDisplay:
+    return StatusDisplay(
+        message_id=row["message_id"],
+        status_id=row["status_id"],
+        enabled_at=row["enabled_at"],
+        failed_at=row["failed_at"],
+        accent_colour=row["accent_colour"],
+        graph_colour=row["graph_colour"],
+        graph_interval=row["graph_interval"],
+    )
+
+
+def _row_to_status_query(row: Record) -> StatusQuery:
+    return StatusQuery(
+        status_query_id=row["status_query_id"],
+        status_id=row["status_id"],
+        host=row["host"],
+        game_port=row["game_port"],
+        query_port=row["query_port"],
+        type=row["type"],
+        priority=row["priority"],
+        enabled_at=row["enabled_at"],
+        failed_at=row["failed_at"],
+        extra=row["extra"],
+    )
+
+
 class DatabaseClient:
     SECRET_SETTINGS = frozenset({"token"})
     """A set of setting names that will always be marked as secrets."""
@@ -311,15 +353,7 @@ class DatabaseClient:
             message_id,
         )
         if row is not None:
-            return StatusDisplay(
-                message_id=row["message_id"],
-                status_id=row["status_id"],
-                enabled_at=row["enabled_at"],
-                failed_at=row["failed_at"],
-                accent_colour=row["accent_colour"],
-                graph_colour=row["graph_colour"],
-                graph_interval=row["graph_interval"],
-            )
+            return _row_to_status_display(row)
 
     # Composite status queries
 
@@ -333,21 +367,19 @@ class DatabaseClient:
             return []
 
         enabled_expr = self._get_only_enabled_condition(only_enabled)
-        sid = ", ".join("?" * len(status_ids))
         statuses = await self.conn.fetch(
-            f"SELECT * FROM status WHERE {enabled_expr} AND status_id IN ({sid}) "
+            f"SELECT * FROM status WHERE {enabled_expr} "
+            f"AND status_id IN (SELECT value FROM json_each($1)) "
             f"ORDER BY LOWER(label)",
-            *status_ids,
+            json.dumps(status_ids),
         )
 
         if with_relationships:
-            status_alerts = await self.get_bulk_status_alerts(
-                *status_ids, only_enabled=only_enabled
-            )
-            status_displays = await self.get_bulk_status_displays(
-                *status_ids, only_enabled=only_enabled
-            )
-            status_queries = await self.get_bulk_status_queries(
+            (
+                status_alerts,
+                status_displays,
+                status_queries,
+            ) = await self._get_bulk_status_relationships(
                 *status_ids, only_enabled=only_enabled
             )
         else:
@@ -389,11 +421,10 @@ class DatabaseClient:
             return []
 
         enabled_expr = self._get_only_enabled_condition(only_enabled)
-        gid = ", ".join("?" * len(guild_ids))
         rows = await self.conn.fetch(
             f"SELECT DISTINCT status_id FROM status WHERE {enabled_expr} "
-            f"AND guild_id IN ({gid})",
-            *guild_ids,
+            f"AND guild_id IN (SELECT value FROM json_each($1))",
+            json.dumps(guild_ids),
         )
         status_ids = [row["status_id"] for row in rows]
 
@@ -407,6 +438,64 @@ class DatabaseClient:
     def _get_only_enabled_condition(only_enabled: bool) -> str:
         return "enabled_at IS NOT NULL" if only_enabled else "true"
 
+    async def _get_bulk_status_relationships(
+        self,
+        *status_ids: int,
+        only_enabled: bool = False,
+    ) -> tuple[
+        dict[int, list[StatusAlert]],
+        dict[int, list[StatusDisplay]],
+        dict[int, list[StatusQuery]],
+    ]:
+        status_alerts = {status_id: [] for status_id in status_ids}
+        status_displays = {status_id: [] for status_id in status_ids}
+        status_queries = {status_id: [] for status_id in status_ids}
+        if not status_ids:
+            return status_alerts, status_displays, status_queries
+
+        # Fetch all three tables in one round trip. Each SELECT fills in its
+        # own columns and pads the rest with NULL. Column types are taken
+        # from the first SELECT, so graph_interval needs an explicit type.
+        enabled_expr = self._get_only_enabled_condition(only_enabled)
+        rows = await self.conn.fetch(
+            f"SELECT 'alert' AS kind, status_id, enabled_at, failed_at, "
+            f"status_alert_id, channel_id, send_audit, send_downtime, "
+            f"NULL AS message_id, NULL AS accent_colour, NULL AS graph_colour, "
+            f'NULL AS "graph_interval [INTERVAL]", '
+            f"NULL AS status_query_id, NULL AS host, NULL AS game_port, "
+            f"NULL AS query_port, NULL AS type, NULL AS priority, NULL AS extra "
+            f"FROM status_alert WHERE {enabled_expr} "
+            f"AND status_id IN (SELECT value FROM json_each($1)) "
+            f"UNION ALL "
+            f"SELECT 'display', status_id, enabled_at, failed_at, "
+            f"NULL, NULL, NULL, NULL, "
+            f"message_id, accent_colour, graph_colour, graph_interval, "
+            f"NULL, NULL, NULL, NULL, NULL, NULL, NULL "
+            f"FROM status_display WHERE {enabled_expr} "
+            f"AND status_id IN (SELECT value FROM json_each($1)) "
+            f"UNION ALL "
+            f"SELECT 'query', status_id, enabled_at, failed_at, "
+            f"NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, "
+            f"status_query_id, host, game_port, query_port, type, priority, extra "
+            f"FROM status_query WHERE {enabled_expr} "
+            f"AND status_id IN (SELECT value FROM json_each($1)) "
+            f"ORDER BY kind, status_id, "
+            f"status_alert_id, message_id, priority, status_query_id",
+            json.dumps(status_ids),
+        )
+
+        # Rows are sorted so each status's relationships can be built
+        # in one go, rather than appending to its list row by row
+        for (kind, status_id), group in groupby(rows, key=itemgetter(0, 1)):
+            if kind == "alert":
+                status_alerts[status_id] = list(map(_row_to_status_alert, group))
+            elif kind == "display":
+                status_displays[status_id] = list(map(_row_to_status_display, group))
+            else:
+                status_queries[status_id] = list(map(_row_to_status_query, group))
+
+        return status_alerts, status_displays, status_queries
+
     async def get_bulk_status_alerts(
         self,
         *status_ids: int,
@@ -417,24 +506,15 @@ class DatabaseClient:
             return status_alerts
 
         enabled_expr = self._get_only_enabled_condition(only_enabled)
-        sid = ", ".join("?" * len(status_ids))
         alerts = await self.conn.fetch(
-            f"SELECT * FROM status_alert WHERE status_id IN ({sid}) "
-            f"AND {enabled_expr} ORDER BY status_alert_id",
-            *status_ids,
+            f"SELECT * FROM status_alert WHERE {enabled_expr} "
+            f"AND status_id IN (SELECT value FROM json_each($1)) "
+            f"ORDER BY status_alert_id",
+            json.dumps(status_ids),
         )
 
         for row in alerts:
-            alert = StatusAlert(
-                status_alert_id=row["status_alert_id"],
-                status_id=row["status_id"],
-                channel_id=row["channel_id"],
-                enabled_at=row["enabled_at"],
-                failed_at=row["failed_at"],
-                send_audit=row["send_audit"],
-                send_downtime=row["send_downtime"],
-            )
-            status_alerts[row["status_id"]].append(alert)
+            status_alerts[row["status_id"]].append(_row_to_status_alert(row))
 
         return status_alerts
 
@@ -448,24 +528,15 @@ class DatabaseClient:
             return status_displays
 
         enabled_expr = self._get_only_enabled_condition(only_enabled)
-        sid = ", ".join("?" * len(status_ids))
         displays = await self.conn.fetch(
-            f"SELECT * FROM status_display WHERE status_id IN ({sid}) "
-            f"AND {enabled_expr} ORDER BY message_id",
-            *status_ids,
+            f"SELECT * FROM status_display WHERE {enabled_expr} "
+            f"AND status_id IN (SELECT value FROM json_each($1)) "
+            f"ORDER BY message_id",
+            json.dumps(status_ids),
         )
 
         for row in displays:
-            display = StatusDisplay(
-                message_id=row["message_id"],
-                status_id=row["status_id"],
-                enabled_at=row["enabled_at"],
-                failed_at=row["failed_at"],
-                accent_colour=row["accent_colour"],
-                graph_colour=row["graph_colour"],
-                graph_interval=row["graph_interval"],
-            )
-            status_displays[row["status_id"]].append(display)
+            status_displays[row["status_id"]].append(_row_to_status_display(row))
 
         return status_displays
 
@@ -479,27 +550,15 @@ class DatabaseClient:
             return status_queries
 
         enabled_expr = self._get_only_enabled_condition(only_enabled)
-        sid = ", ".join("?" * len(status_ids))
         queries = await self.conn.fetch(
-            f"SELECT * FROM status_query WHERE status_id IN ({sid}) "
-            f"AND {enabled_expr} ORDER BY priority, status_query_id",
-            *status_ids,
+            f"SELECT * FROM status_query WHERE {enabled_expr} "
+            f"AND status_id IN (SELECT value FROM json_each($1)) "
+            f"ORDER BY priority, status_query_id",
+            json.dumps(status_ids),
         )
 
         for row in queries:
-            query = StatusQuery(
-                status_query_id=row["status_query_id"],
-                status_id=row["status_id"],
-                host=row["host"],
-                game_port=row["game_port"],
-                query_port=row["query_port"],
-                type=row["type"],
-                priority=row["priority"],
-                enabled_at=row["enabled_at"],
-                failed_at=row["failed_at"],
-                extra=row["extra"],
-            )
-            status_queries[row["status_id"]].append(query)
+            status_queries[row["status_id"]].append(_row_to_status_query(row))
 
         return status_queries
 
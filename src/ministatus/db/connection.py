@@ -63,6 +63,9 @@ class SQLiteConnection(Connection):
     def __init__(self, conn: asqlite.Connection) -> None:
         self.conn = conn
 
+    async def close(self) -> None:
+        await self.conn.close()
+
     async def execute(self, query: str, /, *args: object) -> None:
         if LOG_QUERIES:
             log.debug("SQL execute: %s", query)
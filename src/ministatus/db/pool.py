@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from .connection import SQLiteConnection, TransactionMode
+
+
+class ConnectionPool:
+    """A small pool of long-lived database connections.
+
+    SQLite only allows one writer at a time, so write transactions are
+    serialized onto a single connection, while read transactions are
+    spread across up to *readers* connections.
+    Connections are opened on first use and kept until :meth:`close()`.
+
+    """
+
+    def __init__(self, *, readers: int = 4) -> None:
+        self.readers = readers
+        self._writer: SQLiteConnection | None = None
+        self._writer_lock = asyncio.Lock()
+        self._idle_readers: list[SQLiteConnection] = []
+        self._reader_sem = asyncio.Semaphore(readers)
+        self._closed = False
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        *,
+        transaction: TransactionMode = True,
+    ) -> AsyncIterator[SQLiteConnection]:
+        # Implicit transactions may upgrade to a write, so only explicit
+        # read transactions can be handed to a reader.
+        if transaction == "read":
+            acquire = self._acquire_reader()
+        else:
+            acquire = self._acquire_writer()
+
+        async with acquire as conn, conn.transaction(transaction):
+            yield conn
+
+    async def close(self) -> None:
+        self._closed = True
+
+        async with self._writer_lock:
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+
+        readers, self._idle_readers = self._idle_readers, []
+        for conn in readers:
+            await conn.close()
+
+    @asynccontextmanager
+    async def _acquire_writer(self) -> AsyncIterator[SQLiteConnection]:
+        async with self._writer_lock:
+            self._check_closed()
+            if self._writer is None:
+                self._writer = await self._open()
+            yield self._writer
+
+    @asynccontextmanager
+    async def _acquire_reader(self) -> AsyncIterator[SQLiteConnection]:
+        async with self._reader_sem:
+            self._check_closed()
+            if self._idle_readers:
+                conn = self._idle_readers.pop()
+            else:
+                conn = await self._open()
+
+            try:
+                yield conn
+            finally:
+                if self._closed:
+                    await conn.close()
+                else:
+                    self._idle_readers.append(conn)
+
+    def _check_closed(self) -> None:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+    async def _open(self) -> SQLiteConnection:
+        from . import open_connection
+
+        return await open_connection()
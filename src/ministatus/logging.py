@@ -6,8 +6,6 @@ import os
 import sys
 from typing import Any
 
-from ministatus.appdirs import APP_DIRS
-
 DATEFMT = "%Y-%m-%d %H:%M:%S"
 LOG_RECORD_ATTRIBUTES = {
     "args",
@@ -159,6 +157,8 @@ class ColourFormatter(logging.Formatter):
 
 
 def create_jsonl_handler() -> logging.FileHandler:
+    from ministatus.appdirs import APP_DIRS
+
     handler = logging.handlers.RotatingFileHandler(
         filename=APP_DIRS.user_log_path / f"{APP_DIRS.appname}.jsonl",
         maxBytes=5_000_000,